@@ -44,11 +44,90 @@ def get_env_map(name, default=None):
         return dict(e.split(':') for e in os.environ[name].split(','))
     return default or {}
 
+
+def get_redis_cache(alias, db):
+    """
+    Helper to get Redis cache configuration from environment.
+
+    Uses REDIS_<ALIAS>_<NAME> variables with fallback to REDIS_<NAME>,
+    except for database number.
+    """
+    def get_option(name, default):
+        return os.environ.get(
+            'REDIS_{0}{1}'.format(alias, name),
+            os.environ.get('REDIS_{0}'.format(name), default)
+        )
+
+    options = {
+        'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        'PARSER_CLASS': 'redis.connection.HiredisParser',
+        'CONNECTION_POOL_CLASS': 'redis.BlockingConnectionPool',
+        'CONNECTION_POOL_KWARGS': {
+            'max_connections': int(get_option('MAX_CONNECTIONS', '50')),
+            'timeout': 20,
+        },
+        'SERIALIZER': {
+            'pickle': 'django_redis.serializers.pickle.PickleSerializer',
+            'json': 'django_redis.serializers.json.JSONSerializer',
+            'msgpack': 'django_redis.serializers.msgpack.MSGPackSerializer',
+        }[get_option('SERIALIZER', 'pickle')],
+    }
+    compressor = get_option('COMPRESSOR', '')
+    if compressor:
+        options['COMPRESSOR'] = {
+            'zlib': 'django_redis.compressors.zlib.ZlibCompressor',
+            'lz4': 'django_redis.compressors.lz4.Lz4Compressor',
+            'lzma': 'django_redis.compressors.lzma.LzmaCompressor',
+        }[compressor]
+    return {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://{0}:{1}/{2}'.format(
+            os.environ.get('REDIS_HOST', 'cache'),
+            os.environ.get('REDIS_PORT', '6379'),
+            os.environ.get('REDIS_{0}DB'.format(alias), db),
+        ),
+        'OPTIONS': options,
+        'KEY_PREFIX': 'weblate',
+    }
+
+
+def get_memcached_cache(servers):
+    """
+    Helper to get memcached cache configuration from environment.
+
+    Uses libmemcached based pylibmc client unless MEMCACHED_CLIENT is set
+    to python-memcached.
+    """
+    if os.environ.get('MEMCACHED_CLIENT', 'pylibmc') == 'python-memcached':
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': servers,
+            'KEY_PREFIX': 'weblate',
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+        'LOCATION': servers,
+        'OPTIONS': {
+            'binary': True,
+            'behaviors': {
+                'tcp_nodelay': True,
+                # Consistent hashing, adding server remaps only part of keys
+                'ketama': True,
+                # Skip failed server instead of waiting for it
+                'remove_failed': 4,
+                'retry_timeout': 2,
+                'dead_timeout': 10,
+                'connect_timeout': 1000,
+            },
+        },
+        'KEY_PREFIX': 'weblate',
+    }
+
 #
 # Django settings for Weblate project.
 #
 
-DEBUG = os.environ.get('WEBLATE_DEBUG', '1') == '1'
+DEBUG = os.environ.get('WEBLATE_DEBUG', '0') == '1'
 
 ADMINS = (
     (os.environ['WEBLATE_ADMIN_NAME'], os.environ['WEBLATE_ADMIN_EMAIL']),
@@ -74,9 +153,67 @@ DATABASES = {
         'HOST': os.environ['POSTGRES_HOST'],
         # Set to empty string for default. Not used with sqlite3.
         'PORT': os.environ['POSTGRES_PORT'],
+        # Lifetime of persistent connections in seconds, 0 closes them
+        # after each request
+        'CONN_MAX_AGE': int(os.environ.get('WEBLATE_DB_POOL_MAX_AGE', '0')),
+        'OPTIONS': {},
     }
 }
 
+# Detect stale persistent connections using TCP keepalives
+if DATABASES['default']['CONN_MAX_AGE']:
+    DATABASES['default']['OPTIONS'].update({
+        'keepalives': 1,
+        'keepalives_idle': int(
+            os.environ.get('WEBLATE_DB_POOL_KEEPALIVES_IDLE', '60')
+        ),
+        'keepalives_interval': 10,
+        'keepalives_count': 3,
+    })
+
+# Read only replicas, these connect directly and not through pgbouncer
+for number, replica in enumerate(get_env_list('POSTGRES_REPLICA_HOSTS'), 1):
+    replica_host, _sep, replica_port = replica.strip().partition(':')
+    DATABASES['replica{0}'.format(number)] = dict(
+        DATABASES['default'],
+        HOST=replica_host,
+        PORT=replica_port,
+        TEST={'MIRROR': 'default'},
+        # Lag is checked within requests, do not wait long for unreachable
+        # replica
+        OPTIONS=dict(
+            DATABASES['default']['OPTIONS'],
+            connect_timeout=int(
+                os.environ.get('WEBLATE_DB_REPLICA_CONNECT_TIMEOUT', '2')
+            ),
+        ),
+    )
+
+if len(DATABASES) > 1:
+    DATABASE_ROUTERS = ['weblate_docker.routers.ReplicaRouter']
+    # Safe requests to these paths read from replicas
+    DATABASE_REPLICA_PATHS = get_env_list(
+        'WEBLATE_DB_REPLICA_PATHS',
+        ['/api/', '/widgets/', '/data/', '/exports/', '/sitemap', '/stats/']
+    )
+    # Replicas lagging more (in seconds) are not used
+    DATABASE_REPLICA_MAX_LAG = float(
+        os.environ.get('WEBLATE_DB_REPLICA_MAX_LAG', '5')
+    )
+    # How long (in seconds) clients read from primary after writing
+    DATABASE_REPLICA_STICKY = int(
+        os.environ.get('WEBLATE_DB_REPLICA_STICKY', '10')
+    )
+
+# Connect through bundled pgbouncer in transaction pooling mode
+if os.environ.get('WEBLATE_DB_POOL_BOUNCER', '0') == '1':
+    DATABASES['default']['HOST'] = '127.0.0.1'
+    DATABASES['default']['PORT'] = os.environ.get(
+        'WEBLATE_DB_POOL_BOUNCER_PORT', '6432'
+    )
+    # Server side cursors do not survive transaction pooling
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Data directory
@@ -163,7 +300,9 @@ MEDIA_URL = '{0}/media/'.format(URL_PREFIX)
 # Don't put anything in this directory yourself; store your static files
 # in apps' "static/" subdirectories and in STATICFILES_DIRS.
 # Example: "/home/media/media.lawrence.com/static/"
-STATIC_ROOT = os.path.join(DATA_DIR, 'static')
+# The files are collected during image build, so they live outside of the
+# data volume.
+STATIC_ROOT = '/app/cache/static'
 
 # URL prefix for static files.
 # Example: "http://media.lawrence.com/static/"
@@ -184,6 +323,27 @@ STATICFILES_FINDERS = (
     'compressor.finders.CompressorFinder',
 )
 
+# Store static files with content hash in the name
+STATICFILES_STORAGE = \
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+
+# Compress CSS and JavaScript during image build instead of on first
+# requests, the manifests are generated for both DEBUG modes as it affects
+# static files URLs
+COMPRESS_OFFLINE = os.environ.get('WEBLATE_COMPRESS_OFFLINE', '1') == '1'
+if COMPRESS_OFFLINE:
+    COMPRESS_ENABLED = True
+    COMPRESS_OFFLINE_MANIFEST = \
+        'manifest-debug.json' if DEBUG else 'manifest.json'
+    COMPRESS_OFFLINE_CONTEXT = [
+        {
+            'STATIC_URL': '{0}/static/'.format(URL_PREFIX),
+            'LANGUAGE_BIDI': bidi,
+            'cache_param': '?v={0}'.format(os.environ.get('VERSION', '')),
+        }
+        for bidi in (False, True)
+    ]
+
 # Make this unique, and don't share it with anybody.
 # You can generate it using examples/generate-secret-key
 try:
@@ -222,6 +382,14 @@ TEMPLATES = [
 # Please see the documentation for more details.
 GITHUB_USERNAME = os.environ.get('WEBLATE_GITHUB_USERNAME', None)
 
+# Git repositories with same upstream share objects through a mirror in
+# the data volume, initial fetch can be limited to given number of commits
+VCS_SHARED_MIRRORS = os.environ.get('WEBLATE_VCS_SHARED_MIRRORS', '0') == '1'
+VCS_CLONE_DEPTH = int(os.environ.get('WEBLATE_VCS_CLONE_DEPTH', '0'))
+VCS_FETCH_CONCURRENCY = int(
+    os.environ.get('WEBLATE_VCS_FETCH_CONCURRENCY', '4')
+)
+
 # Authentication configuration
 AUTHENTICATION_BACKENDS = ()
 
@@ -391,6 +559,30 @@ MIDDLEWARE = [
     'weblate.middleware.SecurityMiddleware',
 ]
 
+# Versions for nginx micro cache, answered before any redirects or sessions
+MIDDLEWARE.insert(0, 'weblate_docker.microcache.CacheVersionMiddleware')
+
+# Replica routing is enabled per request
+if len(DATABASES) > 1:
+    MIDDLEWARE.insert(0, 'weblate_docker.routers.ReplicaMiddleware')
+
+# Optional per view latency, queries and cache instrumentation
+if os.environ.get('WEBLATE_INSTRUMENTATION', '0') == '1':
+    MIDDLEWARE.insert(
+        0, 'weblate_docker.middleware.InstrumentationMiddleware'
+    )
+    # Requests slower than this (in seconds) are logged
+    INSTRUMENTATION_SLOW_REQUEST = float(
+        os.environ.get('WEBLATE_SLOW_REQUEST', '1')
+    )
+    # Per process statistics for the metrics exporter
+    INSTRUMENTATION_DIR = '/run/weblate/instrumentation'
+
+# Answer conditional requests to API and exports from cached statistics,
+# it has to come after the login checks
+if os.environ.get('WEBLATE_CONDITIONAL_GET', '1') == '1':
+    MIDDLEWARE.append('weblate_docker.conditional.ConditionalGetMiddleware')
+
 # Rollbar integration
 if 'ROLLBAR_KEY' in os.environ:
     MIDDLEWARE.append(
@@ -446,6 +638,11 @@ INSTALLED_APPS = [
     'weblate.gitexport',
 ]
 
+# Fulltext search in PostgreSQL instead of Whoosh index in data volume
+if os.environ.get('WEBLATE_SEARCH_BACKEND', 'whoosh') == 'postgresql':
+    FULLTEXT_BACKEND = 'weblate_docker.search.PostgreSQLFulltext'
+    INSTALLED_APPS.extend(('django.contrib.postgres', 'weblate_docker'))
+
 # Sentry integration
 if 'SENTRY_DSN' in os.environ:
     RAVEN_CONFIG = {
@@ -483,7 +680,12 @@ if platform.system() != 'Windows':
     except IOError:
         HAVE_SYSLOG = False
 
-if DEBUG or not HAVE_SYSLOG:
+# Logging mode, async writes JSON records to stdout from background thread
+LOG_MODE = os.environ.get('WEBLATE_LOG_MODE', 'default')
+
+if LOG_MODE == 'async':
+    DEFAULT_LOG = 'async'
+elif DEBUG or not HAVE_SYSLOG:
     DEFAULT_LOG = 'console'
 else:
     DEFAULT_LOG = 'syslog'
@@ -499,7 +701,12 @@ LOGGING = {
     'filters': {
         'require_debug_false': {
             '()': 'django.utils.log.RequireDebugFalse'
-        }
+        },
+        # Fraction of DEBUG and INFO records logged, per logger
+        'sampling': {
+            '()': 'weblate_docker.log.SamplingFilter',
+            'rates': get_env_map('WEBLATE_LOG_SAMPLING'),
+        },
     },
     'formatters': {
         'syslog': {
@@ -526,7 +733,13 @@ LOGGING = {
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
-            'formatter': 'simple'
+            'formatter': 'simple',
+            'filters': ['sampling'],
+        },
+        'async': {
+            'level': 'DEBUG',
+            '()': 'weblate_docker.log.AsyncHandler',
+            'filters': ['sampling'],
         },
         'django.server': {
             'level': 'INFO',
@@ -537,6 +750,7 @@ LOGGING = {
             'level': 'DEBUG',
             'class': 'logging.handlers.SysLogHandler',
             'formatter': 'syslog',
+            'filters': ['sampling'],
             'address': '/dev/log',
             'facility': SysLogHandler.LOG_LOCAL2,
         },
@@ -568,7 +782,9 @@ LOGGING = {
         # },
         'weblate': {
             'handlers': [DEFAULT_LOG],
-            'level': os.environ.get('WEBLATE_LOGLEVEL', 'DEBUG'),
+            'level': os.environ.get(
+                'WEBLATE_LOGLEVEL', 'DEBUG' if DEBUG else 'INFO'
+            ),
         },
         # Logging VCS operations
         # 'weblate-vcs': {
@@ -635,7 +851,7 @@ if 'WEBLATE_MT_MYMEMORY_ENABLED' in os.environ:
     MT_SERVICES += ('weblate.machinery.mymemory.MyMemoryTranslation',)
 
 if 'WEBLATE_MT_GLOSBE_ENABLED' in os.environ:
-    MT_SERVICES += ('weblateweblate.trans.glosbe.GlosbeTranslation',)
+    MT_SERVICES += ('weblate.machinery.glosbe.GlosbeTranslation',)
 
 # Google API key for Google Translate API
 MT_GOOGLE_KEY = os.environ.get('WEBLATE_MT_GOOGLE_KEY', None)
@@ -664,6 +880,24 @@ MT_SAP_USERNAME = None
 MT_SAP_PASSWORD = None
 MT_SAP_USE_MT = True
 
+# Services are queried concurrently, timeouts are in seconds and can be
+# overridden per service identifier, for example 'deepl:3,google:2'
+MT_TIMEOUT = float(os.environ.get('WEBLATE_MT_TIMEOUT', '5'))
+MT_SERVICE_TIMEOUTS = {
+    name: float(value)
+    for name, value in get_env_map('WEBLATE_MT_SERVICE_TIMEOUTS').items()
+}
+MT_WORKERS = int(os.environ.get('WEBLATE_MT_WORKERS', '8'))
+
+# Lifetime of cached machine translations in seconds
+MT_CACHE_TIMEOUT = int(os.environ.get('WEBLATE_MT_CACHE_TIMEOUT', '604800'))
+
+# Translation memory lookups kept in each process, they are shared through
+# the default cache as well
+MEMORY_CACHE_ENTRIES = int(
+    os.environ.get('WEBLATE_MEMORY_CACHE_ENTRIES', '10000')
+)
+
 # Title of site to use
 SITE_TITLE = os.environ.get('WEBLATE_SITE_TITLE', 'Weblate')
 
@@ -808,38 +1042,43 @@ ALLOWED_HOSTS = get_env_list('WEBLATE_ALLOWED_HOSTS', ['*'])
 
 # Example configuration for caching
 CACHES = {
+    # Avatars are stored on local storage outside of the data volume
     'avatar': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': os.path.join(DATA_DIR, 'avatar-cache'),
+        'BACKEND': 'weblate_docker.cache.AvatarCache',
+        'LOCATION': '/app/cache/avatar',
         'TIMEOUT': 604800,
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': int(
+                os.environ.get('WEBLATE_AVATAR_CACHE_ENTRIES', '10000')
+            ),
         },
     }
 }
 
-if 'MEMCACHED_HOST' in os.environ:
-    CACHES['default'] = {
-        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
-        'LOCATION': '{0}:{1}'.format(
-            os.environ.get('MEMCACHED_HOST', 'cache'),
-            os.environ.get('MEMCACHED_PORT', '11211'),
-        ),
-        'KEY_PREFIX': 'weblate',
-    }
+# List of memcached servers, single server configuration is still supported
+MEMCACHED_HOSTS = get_env_list('MEMCACHED_HOSTS')
+if not MEMCACHED_HOSTS and 'MEMCACHED_HOST' in os.environ:
+    MEMCACHED_HOSTS = ['{0}:{1}'.format(
+        os.environ['MEMCACHED_HOST'],
+        os.environ.get('MEMCACHED_PORT', '11211'),
+    )]
+
+if MEMCACHED_HOSTS:
+    CACHES['default'] = get_memcached_cache(MEMCACHED_HOSTS)
 else:
+    # Translation stats and other bulk data
+    CACHES['default'] = get_redis_cache('', '1')
+    CACHES['sessions'] = get_redis_cache('SESSIONS_', '2')
+    CACHES['throttling'] = get_redis_cache('THROTTLING_', '3')
+    # Machine translation results, can be flushed separately
+    CACHES['machinery'] = get_redis_cache('MACHINERY_', '4')
+    SESSION_CACHE_ALIAS = 'sessions'
+    MT_CACHE = 'machinery'
+
+# No cache server is available during image build
+if os.environ.get('WEBLATE_BUILD', '0') == '1':
     CACHES['default'] = {
-        'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://{0}:{1}/{2}'.format(
-            os.environ.get('REDIS_HOST', 'cache'),
-            os.environ.get('REDIS_PORT', '6379'),
-            os.environ.get('REDIS_DB', '1'),
-        ),
-        'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            'PARSER_CLASS': 'redis.connection.HiredisParser',
-        },
-        'KEY_PREFIX': 'weblate',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
@@ -857,21 +1096,22 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'weblate_docker.throttling.AnonRateThrottle',
+        'weblate_docker.throttling.UserRateThrottle'
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
         'user': '1000/day'
     },
-    'DEFAULT_PAGINATION_CLASS': (
-        'rest_framework.pagination.PageNumberPagination'
-    ),
+    'DEFAULT_PAGINATION_CLASS': 'weblate_docker.pagination.Pagination',
     'PAGE_SIZE': 20,
     'VIEW_DESCRIPTION_FUNCTION': 'weblate.api.views.get_view_description',
     'UNAUTHENTICATED_USER': 'weblate.auth.models.get_anonymous',
 }
 
+# Largest page size clients can request using page_size parameter
+API_MAX_PAGE_SIZE = int(os.environ.get('WEBLATE_API_MAX_PAGE_SIZE', '1000'))
+
 if os.environ.get('WEBLATE_REQUIRE_LOGIN', '0') == '1':
     # Example for restricting access to logged in users
     LOGIN_REQUIRED_URLS = (
@@ -921,9 +1161,19 @@ GOOGLE_ANALYTICS_ID = os.environ.get('WEBLATE_GOOGLE_ANALYTICS_ID', '')
 AKISMET_API_KEY = os.environ.get('WEBLATE_AKISMET_API_KEY', None)
 
 # Celery worker configuration for testing
-if 'MEMCACHED_HOST' in os.environ:
+if os.environ.get('WEBLATE_CELERY_EAGER', '0') == '1':
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_BROKER_URL = 'memory://'
+# Celery worker configuration without Redis, the workers run in the same
+# container, so the queues can be stored in the filesystem
+elif MEMCACHED_HOSTS:
+    CELERY_TASK_ALWAYS_EAGER = False
+    CELERY_BROKER_URL = 'filesystem://'
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'data_folder_in': os.path.join(DATA_DIR, 'celery', 'queue'),
+        'data_folder_out': os.path.join(DATA_DIR, 'celery', 'queue'),
+        'polling_interval': 0.2,
+    }
 # Celery worker configuration for production
 else:
     CELERY_TASK_ALWAYS_EAGER = False
@@ -939,6 +1189,34 @@ CELERY_BEAT_SCHEDULE_FILENAME = os.path.join(
     DATA_DIR, 'celery', 'beat-schedule'
 )
 
+# Route tasks to dedicated queues, each of them has own worker pool
+CELERY_TASK_ROUTES = {
+    'weblate.trans.search.*': {'queue': 'search'},
+    'weblate.trans.tasks.cleanup_fulltext': {'queue': 'search'},
+    'weblate.trans.tasks.optimize_fulltext': {'queue': 'search'},
+    'weblate.memory.tasks.*': {'queue': 'memory'},
+    'weblate.accounts.notifications.send_mails': {'queue': 'notify'},
+    'weblate.screenshots.tasks.ocr_image': {'queue': 'ocr'},
+    'weblate.trans.tasks.perform_update': {'queue': 'vcs'},
+    'weblate.trans.tasks.perform_commit': {'queue': 'vcs'},
+    'weblate.trans.tasks.commit_pending': {'queue': 'vcs'},
+    'weblate.trans.tasks.update_remotes': {'queue': 'vcs'},
+    'weblate.trans.tasks.cleanup_stale_repos': {'queue': 'vcs'},
+}
+
+# Task events are needed for runtime metrics
+CELERY_WORKER_SEND_TASK_EVENTS = os.environ.get('WEBLATE_METRICS', '0') == '1'
+
+# Include queue name in the worker log to allow per queue statistics
+if 'CELERY_WORKER_QUEUE' in os.environ:
+    CELERY_WORKER_LOG_FORMAT = (
+        '[%(asctime)s: %(levelname)s/{0}/%(processName)s] %(message)s'
+    ).format(os.environ['CELERY_WORKER_QUEUE'])
+    CELERY_WORKER_TASK_LOG_FORMAT = (
+        '[%(asctime)s: %(levelname)s/{0}/%(processName)s] '
+        '%(task_name)s[%(task_id)s]: %(message)s'
+    ).format(os.environ['CELERY_WORKER_QUEUE'])
+
 ADDITIONAL_CONFIG = '/app/data/settings-override.py'
 if os.path.exists(ADDITIONAL_CONFIG):
     with open(ADDITIONAL_CONFIG) as handle:
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Avatar cache with least recently used eviction."""
+
+from __future__ import unicode_literals
+
+import glob
+import hashlib
+import os
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+STATS_KEY = 'avatar-stats-{0}'
+
+STATS = ('hits', 'misses', 'evictions')
+
+MISSING = object()
+
+
+def record_stats(name, count=1):
+    """Increase shared counter in default cache."""
+    cache = caches['default']
+    key = STATS_KEY.format(name)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        cache.set(key, count, None)
+
+
+def get_stats():
+    """Return hits, misses and evictions counters."""
+    values = caches['default'].get_many(
+        [STATS_KEY.format(name) for name in STATS]
+    )
+    return {name: values.get(STATS_KEY.format(name), 0) for name in STATS}
+
+
+class AvatarCache(FileBasedCache):
+    """
+    File based cache suitable for large number of entries.
+
+    The files are spread into subdirectories, the entries are counted only
+    once per cull interval and least recently used ones are evicted.
+    """
+
+    cull_interval = 60
+
+    def __init__(self, dir, params):
+        super(AvatarCache, self).__init__(dir, params)
+        self._culled = 0
+
+    def _key_to_file(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        return os.path.join(
+            self._dir, digest[:2], digest + self.cache_suffix
+        )
+
+    def _list_cache_files(self):
+        return glob.glob(
+            os.path.join(self._dir, '*', '*' + self.cache_suffix)
+        )
+
+    def get(self, key, default=None, version=None):
+        value = super(AvatarCache, self).get(key, MISSING, version)
+        if value is MISSING:
+            record_stats('misses')
+            return default
+        # Track usage for eviction
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+        record_stats('hits')
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        dirname = os.path.dirname(self._key_to_file(key, version))
+        if not os.path.exists(dirname):
+            os.makedirs(dirname, 0o700, exist_ok=True)
+        super(AvatarCache, self).set(key, value, timeout, version)
+
+    def _cull(self):
+        now = time.time()
+        if now - self._culled < self.cull_interval:
+            return
+        self._culled = now
+
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+
+        entries = []
+        for name in filelist:
+            try:
+                entries.append((os.stat(name).st_mtime, name))
+            except OSError:
+                continue
+        entries.sort()
+
+        # Remove least recently used entries to get below the limit
+        count = len(entries) - self._max_entries
+        if self._cull_frequency:
+            count += self._max_entries // self._cull_frequency
+        if count <= 0:
+            return
+        for _mtime, name in entries[:count]:
+            self._delete(name)
+        record_stats('evictions', count)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Conditional GET for API and export views using cached statistics."""
+
+from __future__ import unicode_literals
+
+import calendar
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+# Views answered from validators, the translation, component or project
+# is identified by their URL keyword arguments
+VIEWS = frozenset((
+    'download_translation',
+    'export_stats',
+    'api:translation-detail',
+    'api:translation-statistics',
+    'api:translation-file',
+    'api:component-detail',
+    'api:component-statistics',
+    'api:component-translations',
+    'api:project-detail',
+    'api:project-statistics',
+))
+
+# Request headers changing the rendered response
+VARY_HEADERS = ('HTTP_ACCEPT', 'HTTP_ACCEPT_LANGUAGE')
+
+# Time when validator was first seen has to outlive default cache timeout,
+# otherwise Last-Modified of unchanged resources would move forward
+SEEN_TIMEOUT = 30 * 86400
+
+
+def get_object(user, kwargs):
+    """Load translation, component or project the view would show."""
+    from weblate.trans.models import Component, Translation
+
+    projects = user.allowed_projects
+    if 'lang' in kwargs or 'language__code' in kwargs:
+        return Translation.objects.prefetch().filter(
+            component__project__in=projects,
+            component__project__slug=kwargs.get(
+                'project', kwargs.get('component__project__slug')
+            ),
+            component__slug=kwargs.get(
+                'component', kwargs.get('component__slug')
+            ),
+            language__code=kwargs.get('lang', kwargs.get('language__code')),
+        ).first()
+    if 'component' in kwargs or 'project__slug' in kwargs:
+        return Component.objects.prefetch().filter(
+            project__in=projects,
+            project__slug=kwargs.get('project', kwargs.get('project__slug')),
+            slug=kwargs.get('component', kwargs.get('slug')),
+        ).first()
+    return projects.filter(
+        slug=kwargs.get('project', kwargs.get('slug'))
+    ).first()
+
+
+def get_user(request):
+    """Authenticate API tokens the same way the REST framework will."""
+    if 'HTTP_AUTHORIZATION' in request.META:
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            if issubclass(authenticator, SessionAuthentication):
+                continue
+            result = authenticator().authenticate(request)
+            if result is not None:
+                return result[0]
+    return request.user
+
+
+def get_etag(request, user, obj):
+    """
+    Calculate validator for the response.
+
+    Cached statistics are invalidated on every change of the translation
+    and propagated to its component and project, the field values cover
+    changes of the object itself, such as a new file revision.
+    """
+    obj.stats.ensure_basic()
+    digest = hashlib.sha1()
+    digest.update(json.dumps([
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        user.pk,
+        [request.META.get(header, '') for header in VARY_HEADERS],
+        [
+            getattr(obj, field.attname)
+            for field in obj._meta.concrete_fields
+        ],
+        obj.stats.get_data(),
+    ], sort_keys=True, default=str).encode('utf-8'))
+    return '"{0}"'.format(digest.hexdigest())
+
+
+def get_last_modified(etag, last_changed):
+    """
+    Return modification timestamp for the validator.
+
+    The time the validator was first seen is used when it is newer than
+    the last change, so that changes without change entries still
+    advance it.
+    """
+    seen = cache.get_or_set(
+        'conditional-{0}'.format(etag), int(time.time()), SEEN_TIMEOUT
+    )
+    if last_changed is None:
+        return seen
+    return max(seen, calendar.timegm(last_changed.utctimetuple()))
+
+
+class ConditionalGetMiddleware(object):
+    """
+    Answer conditional GET requests without executing the view.
+
+    The validators are calculated from the cached statistics instead of
+    the rendered body, unchanged resources are answered by 304 Not
+    Modified and successful responses carry ETag and Last-Modified headers.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        validators = getattr(request, 'weblate_validators', None)
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            if not response.has_header('ETag'):
+                response['ETag'] = etag
+            if not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if request.resolver_match.view_name not in VIEWS:
+            return None
+        try:
+            user = get_user(request)
+        except AuthenticationFailed:
+            return None
+        obj = get_object(user, view_kwargs)
+        if obj is None:
+            return None
+        etag = get_etag(request, user, obj)
+        last_modified = get_last_modified(etag, obj.stats.last_changed)
+        request.weblate_validators = (etag, last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
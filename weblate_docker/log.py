@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Non blocking JSON logging with sampling of verbose records."""
+
+from __future__ import unicode_literals
+
+import atexit
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import sys
+import threading
+
+
+class JSONFormatter(logging.Formatter):
+    """Format record as single line JSON object."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, sort_keys=True)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass only fraction of DEBUG and INFO records.
+
+    The rates are configured per logger name, the most specific one
+    applies to child loggers as well.
+    """
+
+    def __init__(self, rates=None):
+        super(SamplingFilter, self).__init__()
+        self.rates = sorted(
+            ((name, float(rate)) for name, rate in (rates or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+
+    def get_rate(self, name):
+        for logger, rate in self.rates:
+            if name == logger or name.startswith(logger + '.'):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.get_rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Queue records to be written to stdout by a background thread.
+
+    The thread is started in each process on first use as uWSGI and Celery
+    fork workers after configuring logging. Records are dropped when the
+    queue is full instead of blocking the caller.
+    """
+
+    def __init__(self, size=10000):
+        super(AsyncHandler, self).__init__(None)
+        self.size = size
+        self.pid = None
+        self.listener = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.size)
+            target = logging.StreamHandler(sys.stdout)
+            target.setFormatter(JSONFormatter())
+            self.listener = QueueListener(self.queue, target)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def stop(self):
+        if self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+
+    def prepare(self, record):
+        # Format arguments and traceback now, they might change before
+        # the record is written
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'weblate.logging',
+                    'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                    'msg': 'Dropped {0} log records'.format(self.dropped),
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self.start()
+        super(AsyncHandler, self).emit(record)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from weblate.trans.models import Unit
+from weblate_docker.search import update_units
+
+
+class Command(BaseCommand):
+    help = 'backfills PostgreSQL fulltext search documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=10000,
+            help='number of units updated in single transaction'
+        )
+        parser.add_argument(
+            '--start',
+            type=int,
+            default=None,
+            help='resume from given unit id'
+        )
+
+    def handle(self, *args, **options):
+        bounds = Unit.objects.aggregate(Min('pk'), Max('pk'))
+        if bounds['pk__max'] is None:
+            return
+        start = options['start']
+        if start is None:
+            start = bounds['pk__min'] - 1
+        total = 0
+        while start < bounds['pk__max']:
+            end = start + options['chunk']
+            total += update_units(
+                'id > %(start)s AND id <= %(end)s',
+                {'start': start, 'end': end}
+            )
+            self.stdout.write(
+                'Processed {0} units, up to id {1}'.format(total, end)
+            )
+            start = end
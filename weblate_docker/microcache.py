@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Versions of pages cached by nginx."""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+from urllib.parse import urlsplit
+
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+# Internal location queried by nginx before using the cache
+VERSION_PATH = '/_weblate/cache-version'
+
+
+def get_version(uri):
+    """
+    Return version of cached page for given request URI.
+
+    The cached pages show statistics of the project, these are
+    invalidated on every change of its translations, so the version
+    changes as soon as the change is visible in Weblate. Pages not
+    belonging to a project are not versioned.
+    """
+    from weblate.trans.models import Project
+
+    try:
+        match = resolve(urlsplit(uri).path)
+    except Resolver404:
+        return ''
+    if 'project' not in match.kwargs:
+        return ''
+    project = Project.objects.filter(slug=match.kwargs['project']).first()
+    if project is None:
+        return ''
+    project.stats.ensure_basic()
+    digest = hashlib.sha1()
+    digest.update(json.dumps(
+        [project.pk, project.stats.get_data()],
+        sort_keys=True,
+        default=str,
+    ).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheVersionMiddleware(object):
+    """
+    Answer version requests from nginx.
+
+    The version is included in the micro cache key, the location is
+    internal in nginx which passes original request URI in a header.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info != VERSION_PATH:
+            return self.get_response(request)
+        response = HttpResponse()
+        response['X-Weblate-Cache-Version'] = get_version(
+            request.META.get('HTTP_X_ORIGINAL_URI', '')
+        )
+        return response
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Per view latency, query and cache instrumentation."""
+
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from contextlib import ExitStack
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+LOGGER = logging.getLogger('weblate.instrumentation')
+
+# Latency histogram buckets in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CACHE_METHODS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many',
+    'incr', 'decr',
+)
+
+LOCAL = threading.local()
+
+
+class RequestCounter(object):
+    """Counts queries and cache operations within single request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_ops = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.time() - start
+
+
+def count_cache(method):
+    def wrapper(*args, **kwargs):
+        counter = getattr(LOCAL, 'counter', None)
+        if counter is not None:
+            counter.cache_ops += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def instrument_caches():
+    """Wrap cache methods of this thread cache instances."""
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if getattr(cache, 'weblate_instrumented', False):
+            continue
+        for name in CACHE_METHODS:
+            setattr(cache, name, count_cache(getattr(cache, name)))
+        cache.weblate_instrumented = True
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.url_name or 'unknown'
+
+
+class ViewStats(object):
+    """Aggregated statistics for views handled by this process."""
+
+    def __init__(self):
+        self.views = defaultdict(lambda: {
+            'count': 0,
+            'seconds': 0.0,
+            'buckets': [0] * len(BUCKETS),
+            'queries': 0,
+            'query_seconds': 0.0,
+            'cache_ops': 0,
+        })
+        self.flushed = time.time()
+
+    def record(self, view, elapsed, counter):
+        stats = self.views[view]
+        stats['count'] += 1
+        stats['seconds'] += elapsed
+        for i, bucket in enumerate(BUCKETS):
+            if elapsed <= bucket:
+                stats['buckets'][i] += 1
+        stats['queries'] += counter.queries
+        stats['query_seconds'] += counter.query_time
+        stats['cache_ops'] += counter.cache_ops
+
+    def flush(self, force=False):
+        """Store statistics for the metrics exporter."""
+        directory = getattr(settings, 'INSTRUMENTATION_DIR', None)
+        if not directory:
+            return
+        now = time.time()
+        if not force and now - self.flushed < 10:
+            return
+        self.flushed = now
+        filename = os.path.join(directory, '{0}.json'.format(os.getpid()))
+        try:
+            with open(filename + '.tmp', 'w') as handle:
+                json.dump(self.views, handle)
+            os.rename(filename + '.tmp', filename)
+        except (IOError, OSError) as error:
+            LOGGER.error('failed to store view statistics: %s', error)
+
+
+class InstrumentationMiddleware(object):
+    """Record latency, SQL queries and cache operations per view."""
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST', 1)
+        self.stats = ViewStats()
+
+    def __call__(self, request):
+        instrument_caches()
+        counter = LOCAL.counter = RequestCounter()
+        start = time.time()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = self.get_response(request)
+        finally:
+            LOCAL.counter = None
+        elapsed = time.time() - start
+
+        view = get_view_name(request)
+        self.stats.record(view, elapsed, counter)
+        self.stats.flush()
+
+        if elapsed >= self.threshold:
+            LOGGER.warning('slow request %s', json.dumps({
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'seconds': round(elapsed, 3),
+                'queries': counter.queries,
+                'query_seconds': round(counter.query_time, 3),
+                'cache_ops': counter.cache_ops,
+            }, sort_keys=True))
+        return response
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('trans', '0006_suggestion_userdetails'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='UnitSearch',
+            fields=[
+                ('unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='trans.Unit')),
+                ('source', models.TextField()),
+                ('source_vector', django.contrib.postgres.search.SearchVectorField()),
+                ('target_vector', django.contrib.postgres.search.SearchVectorField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='unitsearch',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['source_vector'], name='weblate_docker_source_vector'),
+        ),
+        migrations.AddIndex(
+            model_name='unitsearch',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['target_vector'], name='weblate_docker_target_vector'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX weblate_docker_unitsearch_source_trgm '
+            'ON weblate_docker_unitsearch USING GIN (source gin_trgm_ops)',
+            'DROP INDEX weblate_docker_unitsearch_source_trgm',
+        ),
+    ]
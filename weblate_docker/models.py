@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""Models for PostgreSQL fulltext search backend."""
+
+from __future__ import unicode_literals
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class UnitSearch(models.Model):
+    """Search document for translation unit, see weblate_docker.search."""
+
+    unit = models.OneToOneField(
+        'trans.Unit', on_delete=models.CASCADE, primary_key=True,
+    )
+    # Copy of source string for trigram similarity
+    source = models.TextField()
+    # Source string, context and location
+    source_vector = SearchVectorField()
+    # Target string and comment
+    target_vector = SearchVectorField()
+
+    class Meta(object):
+        indexes = [
+            GinIndex(
+                fields=['source_vector'], name='weblate_docker_source_vector'
+            ),
+            GinIndex(
+                fields=['target_vector'], name='weblate_docker_target_vector'
+            ),
+        ]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""REST framework pagination with opt-in cursor mode."""
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Keyset pagination over primary key, no count or offset is needed."""
+
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+
+class Pagination(pagination.PageNumberPagination):
+    """
+    Page number pagination, switching to cursor one on request.
+
+    Clients opt in using ?pagination=cursor and follow the next links,
+    the page size can be chosen using ?page_size= in both modes.
+    """
+
+    page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+    cursor = None
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            self.cursor = CursorPagination()
+            result = self.cursor.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor.display_page_controls
+            return result
+        return super(Pagination, self).paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super(Pagination, self).get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor is not None:
+            return self.cursor.to_html()
+        return super(Pagination, self).to_html()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Database routing of safe reads to read only replicas."""
+
+from __future__ import unicode_literals
+
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+LOGGER = logging.getLogger('weblate.replica')
+
+# Seconds since last replayed transaction, zero on primary
+REPLICA_LAG_QUERY = (
+    'SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE(EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END'
+)
+
+# How often is replica lag checked in each process
+CHECK_INTERVAL = 5
+
+# Cookie marking clients which have recently written to the database
+STICKY_COOKIE = 'weblate_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+LOCAL = threading.local()
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+def get_replica_lag(alias):
+    """Return replication lag of replica in seconds."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(REPLICA_LAG_QUERY)
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaHealth(object):
+    """Per process list of replicas within allowed lag."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.healthy = []
+
+    def check(self):
+        healthy = []
+        for alias in get_replicas():
+            try:
+                lag = get_replica_lag(alias)
+            except Exception as error:
+                LOGGER.warning('Replica %s is not available: %s', alias, error)
+                continue
+            if lag > settings.DATABASE_REPLICA_MAX_LAG:
+                LOGGER.warning('Replica %s lags %.1fs behind', alias, lag)
+                continue
+            healthy.append(alias)
+        return healthy
+
+    def get(self):
+        if time.time() - self.checked > CHECK_INTERVAL:
+            # Only one thread checks, others use previous state
+            if self.lock.acquire(False):
+                try:
+                    self.healthy = self.check()
+                    self.checked = time.time()
+                finally:
+                    self.lock.release()
+        return self.healthy
+
+
+HEALTH = ReplicaHealth()
+
+
+class ReplicaRouter(object):
+    """
+    Route reads to replica when allowed by ReplicaMiddleware.
+
+    Everything outside of requests, such as background tasks and management
+    commands, uses primary database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(LOCAL, 'replica', False):
+            return 'default'
+        # Stick to single replica within request
+        alias = getattr(LOCAL, 'alias', None)
+        if alias is None:
+            healthy = HEALTH.get()
+            alias = LOCAL.alias = random.choice(healthy or ['default'])
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Read own writes for rest of the request
+        LOCAL.replica = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaMiddleware(object):
+    """
+    Allow replica reads for safe requests to configured paths.
+
+    Clients which have modified data are pinned to primary for
+    DATABASE_REPLICA_STICKY seconds to read their own writes.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        LOCAL.replica = (
+            request.method in SAFE_METHODS and
+            STICKY_COOKIE not in request.COOKIES and
+            request.path.startswith(tuple(settings.DATABASE_REPLICA_PATHS))
+        )
+        LOCAL.alias = None
+        try:
+            response = self.get_response(request)
+        finally:
+            LOCAL.replica = False
+            LOCAL.alias = None
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_STICKY,
+                httponly=True,
+            )
+        return response
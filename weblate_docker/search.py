@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""PostgreSQL fulltext search backend."""
+
+from __future__ import unicode_literals
+
+from django.contrib.postgres.search import SearchQuery, TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+
+from weblate.trans.models import Unit
+from weblate_docker.models import UnitSearch
+
+# Text search configuration, units are in many languages so no stemming
+SEARCH_CONFIG = 'simple'
+
+SOURCE_FIELDS = ('source', 'context', 'location')
+TARGET_FIELDS = ('target', 'comment')
+
+UPDATE_SQL = '''
+INSERT INTO {search} (unit_id, source, source_vector, target_vector)
+SELECT
+    id,
+    source,
+    to_tsvector(%(config)s, source || ' ' || context || ' ' || location),
+    to_tsvector(%(config)s, target || ' ' || comment)
+FROM {unit}
+WHERE {where}
+ON CONFLICT (unit_id) DO UPDATE SET
+    source = EXCLUDED.source,
+    source_vector = EXCLUDED.source_vector,
+    target_vector = EXCLUDED.target_vector
+'''
+
+
+def update_units(where, params):
+    """Update search documents for units matching SQL condition."""
+    params = dict(params, config=SEARCH_CONFIG)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPDATE_SQL.format(
+                search=UnitSearch._meta.db_table,
+                unit=Unit._meta.db_table,
+                where=where,
+            ),
+            params
+        )
+        return cursor.rowcount
+
+
+class PostgreSQLFulltext(object):
+    """
+    Fulltext search using tsvector columns in the Weblate database.
+
+    The documents are updated synchronously on unit save and removed
+    together with the unit, so there is no separate index to maintain.
+    """
+    FAKE = False
+
+    @classmethod
+    def update_index_unit(cls, unit):
+        if not cls.FAKE:
+            update_units('id = %(pk)s', {'pk': unit.pk})
+
+    @classmethod
+    def clean_search_unit(cls, pk, lang):
+        UnitSearch.objects.filter(unit_id=pk).delete()
+
+    def search(self, query, langs, params):
+        """Perform fulltext search in given areas.
+
+        Returns subquery of unit primary keys, the languages are limited by
+        the unit query it is used in.
+        """
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        condition = Q(pk__in=[])
+        if any(params.get(field) for field in SOURCE_FIELDS):
+            condition |= Q(source_vector=search_query)
+        if any(params.get(field) for field in TARGET_FIELDS):
+            condition |= Q(target_vector=search_query)
+        return UnitSearch.objects.filter(condition).values_list(
+            'unit_id', flat=True
+        )
+
+    def more_like(self, pk, source, top=5):
+        """Find similar units using trigram similarity."""
+        return list(
+            UnitSearch.objects.filter(
+                source__trigram_similar=source
+            ).exclude(
+                unit_id=pk
+            ).annotate(
+                similarity=TrigramSimilarity('source', source)
+            ).order_by(
+                '-similarity'
+            ).values_list(
+                'unit_id', flat=True
+            )[:top]
+        )
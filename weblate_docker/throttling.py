@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2012 - 2018 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Weblate <https://weblate.org/>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""REST framework throttling using dedicated cache."""
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import throttling
+
+
+class ThrottlingCache(object):
+    """Proxy to throttling cache alias, falling back to default one."""
+
+    def __getattr__(self, name):
+        if 'throttling' in settings.CACHES:
+            return getattr(caches['throttling'], name)
+        return getattr(caches['default'], name)
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle):
+    cache = ThrottlingCache()
+
+
+class UserRateThrottle(throttling.UserRateThrottle):
+    cache = ThrottlingCache()